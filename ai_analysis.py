@@ -7,17 +7,23 @@ import logging
 import os
 import random
 import time
+import traceback
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Optional, Dict, Any
 
 # Local imports
 from utils import (
+    downscale_image,
     encode_image_to_base64, 
     ensure_directory_exists, 
+    filter_existing_files,
+    get_shared_client,
+    upload_image,
     COMBINED_ANALYSIS_FILENAME,
     MULTI_PROVIDER_HTML_FILENAME
 )
+from prompts import MULTI_CONSOLIDATION_PROMPT, get_analysis_prompt_parts, get_chart_context
 
 # Third-party imports with availability checks
 try:
@@ -44,10 +50,19 @@ except ImportError:
     anthropic = None
     ANTHROPIC_AVAILABLE = False
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging (handlers and level are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
+# Print full tracebacks for analysis errors (the error message is always logged)
+_DEBUG_TRACEBACKS = os.getenv('DEBUG_TRACEBACKS', 'False').lower() == 'true'
+
+# Separator line for the local consolidated decision
+_EQ50 = "=" * 50 + "\n"
+
+# Anthropic only caches prompt blocks of at least 1024 tokens (2048 on Haiku);
+# at roughly 4 characters per token, shorter system prompts are sent uncached
+_CLAUDE_MIN_CACHE_CHARS = 1024 * 4
+
 
 class BaseAnalyzer:
     """Base class for AI analysis providers"""
@@ -98,7 +113,8 @@ class PerplexityAnalyzer(BaseAnalyzer):
         self.model = os.getenv('PERPLEXITY_MODEL', 'sonar-pro')
         
         # Initialize the OpenAI client with Perplexity's endpoint
-        self.client = OpenAI(
+        self.client = get_shared_client(
+            OpenAI,
             api_key=self.api_key,
             base_url="https://api.perplexity.ai"
         )
@@ -143,7 +159,7 @@ class ClaudeAnalyzer(BaseAnalyzer):
         self.model = os.getenv('CLAUDE_MODEL', 'claude-sonnet-4-5-20250929')
         
         # Initialize the Anthropic client
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = get_shared_client(anthropic.Anthropic, api_key=self.api_key)
     
     def analyze_screenshots(self, messages: list) -> str:
         """Analyze screenshots using Claude API"""
@@ -187,9 +203,15 @@ class ClaudeAnalyzer(BaseAnalyzer):
                 "messages": claude_messages
             }
             
-            # Add system message if present
+            # Add system message if present. When it is long enough to be cached,
+            # mark it as a prompt-cache breakpoint so repeat requests within the
+            # cache lifetime (5 minutes) read the static instructions at the
+            # cached rate; smaller blocks would be ignored by the cache anyway
             if system_message:
-                request_params["system"] = system_message
+                system_block = {"type": "text", "text": system_message}
+                if len(system_message) >= _CLAUDE_MIN_CACHE_CHARS:
+                    system_block["cache_control"] = {"type": "ephemeral"}
+                request_params["system"] = [system_block]
             
             response = self.client.messages.create(**request_params)
             return response.content[0].text
@@ -294,8 +316,6 @@ class GoogleAIAnalyzer(BaseAnalyzer):
             Analysis text from Google AI
         """
         try:
-            import base64
-            
             # For Gemini, we need to use genai.upload_file for files or pass inline data
             # Build content list with text and images
             content_parts = []
@@ -343,8 +363,8 @@ class GoogleAIAnalyzer(BaseAnalyzer):
             
         except Exception as e:
             logger.error(f"Google AI chart analysis error: {e}")
-            import traceback
-            traceback.print_exc()
+            if _DEBUG_TRACEBACKS:
+                traceback.print_exc()
             return None
     
     def generate_consolidated_decision(self, perplexity_analysis: str, claude_analysis: str, stock_symbol: str = "UNKNOWN", output_dir: str = None, screenshot_data: dict = None, google_analysis: str = None) -> str:
@@ -369,7 +389,7 @@ class GoogleAIAnalyzer(BaseAnalyzer):
                 # Use the trading analyzer to load prior analysis
                 from trading_analysis import PerplexityAnalyzer
                 temp_analyzer = PerplexityAnalyzer()
-                valid_screenshots = {k: v for k, v in screenshot_data.items() if v and os.path.exists(v)}
+                valid_screenshots = filter_existing_files(screenshot_data)
                 if valid_screenshots:
                     prior_analysis = temp_analyzer._load_prior_analysis(output_dir, valid_screenshots, stock_symbol)
             
@@ -544,7 +564,7 @@ Instructions:
             if output_dir and screenshot_data:
                 from trading_analysis import PerplexityAnalyzer
                 temp_analyzer = PerplexityAnalyzer()
-                valid_screenshots = {k: v for k, v in screenshot_data.items() if v and os.path.exists(v)}
+                valid_screenshots = filter_existing_files(screenshot_data)
                 if valid_screenshots:
                     prior_analysis = temp_analyzer._load_prior_analysis(output_dir, valid_screenshots, stock_symbol)
             
@@ -574,68 +594,15 @@ This is the first analysis for this symbol, so focus on current state evaluation
 
 """
             
-            # Build dynamic provider synthesis section
-            provider_synthesis = "\nPROVIDER SYNTHESIS:\n"
-            for provider_name in provider_analyses:
-                provider_synthesis += f"- {provider_name.title()} Focus: [Summarize key points from {provider_name.title()}]\n"
-            provider_synthesis += "- Agreement Areas: [Where providers align]\n"
-            provider_synthesis += "- Disagreement Areas: [Where providers differ]\n"
-            
-            prompt = f"""
-You are an expert financial analyst tasked with creating a consolidated trading decision based on analyses from multiple AI providers.
-
+            # Fixed instructions first, per-symbol data last (a shared prefix, though
+            # too short for Gemini's implicit cache; see MULTI_CONSOLIDATION_PROMPT)
+            provider_list = ", ".join(name.title() for name in provider_names)
+            prompt = f"""{MULTI_CONSOLIDATION_PROMPT}
 STOCK SYMBOL: {stock_symbol}
+PROVIDERS: {provider_list}
 
 {provider_sections}
-
-{prior_context}
-
-Based on these comprehensive analyses, generate a consolidated trading decision with the following format:
-
-==================================================
-CONSOLIDATED TRADING DECISION FOR {stock_symbol}
-==================================================
-
-TRADING DECISION: [BUY/SELL/HOLD]
-Consensus Assessment: [Describe agreement/disagreement between providers]
-Overall Confidence: [Provide a confidence percentage 0-100%]
-
-TREND CHANGE EVALUATION:
-[Synthesize the trend change probability from all analyses]
-[Provide consolidated probability assessment]
-[Explain key factors driving the trend evaluation]
-
-CRITICAL FACTORS:
-- [List 3-5 most important technical factors from all analyses]
-- [Highlight any conflicting signals between providers]
-- [Note volume, momentum, and support/resistance levels]
-
-RISK ASSESSMENT:
-- Upside Potential: [Based on resistance levels and bullish signals]
-- Downside Risk: [Based on support levels and bearish signals]
-- Stop Loss Recommendation: [If applicable]
-{provider_synthesis}
-
-EMAIL ALERT DECISION:
-Based on the analysis above, determine if an email alert should be sent.
-Consider:
-- Trend change probability (higher probability = more likely to send)
-- Alert levels from all providers
-- Significance of changes detected
-- Trading decision confidence
-
-Clearly state: EMAIL ALERT DECISION: YES or EMAIL ALERT DECISION: NO
-
-==================================================
-
-Instructions:
-1. Synthesize all analyses into a coherent trading decision
-2. Highlight areas of agreement and disagreement
-3. Provide specific price targets and risk levels when mentioned
-4. Be objective and balanced in your assessment
-5. Focus on actionable trading insights
-6. Email alerts should be sent for significant changes that traders need to act on
-"""
+{prior_context}"""
 
             # Helper to call the model with retries/backoff for transient errors
             def _call_with_backoff(prompt_text, max_attempts=5, base_delay=1.0):
@@ -713,7 +680,8 @@ class GrokAnalyzer(BaseAnalyzer):
         self.model = os.getenv('GROK_MODEL', 'grok-2')
         
         # Initialize the OpenAI client with Grok's endpoint
-        self.client = OpenAI(
+        self.client = get_shared_client(
+            OpenAI,
             api_key=self.api_key,
             base_url="https://api.x.ai/v1"
         )
@@ -758,7 +726,7 @@ class OpenAIAnalyzer(BaseAnalyzer):
         self.model = os.getenv('OPENAI_MODEL', 'gpt-4o')
         
         # Initialize the OpenAI client
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_shared_client(OpenAI, api_key=self.api_key)
     
     def analyze_screenshots(self, messages: list) -> str:
         """Analyze screenshots using OpenAI API"""
@@ -840,6 +808,9 @@ class TradingAnalyzer:
         except Exception as e:
             logger.warning(f"Could not initialize original analyzer: {e}")
         
+        # Image host for Perplexity screenshots (sent by URL instead of inline base64)
+        self.perplexity_image_upload_url = os.getenv('PERPLEXITY_IMAGE_UPLOAD_URL')
+        
         # Initialize enabled AI providers
         self.providers = {}
         self.google_analyzer = None
@@ -932,10 +903,14 @@ class TradingAnalyzer:
         if not self.providers:
             logger.warning("No AI providers enabled or properly configured. Check API keys and enable flags.")
     
-    def _run_single_provider(self, provider_name: str, screenshot_data: dict, output_dir: str, stock_symbol: str):
+    def _run_single_provider(self, provider_name: str, screenshot_data: dict, output_dir: str, stock_symbol: str,
+                             image_data_uris: dict = None):
         """
         Run analysis for a single provider (used for parallel execution)
         
+        Args:
+            image_data_uris: Optional pre-encoded images shared by all providers
+        
         Returns:
             Tuple of (provider_name, analysis_text, change_analysis)
         """
@@ -945,12 +920,16 @@ class TradingAnalyzer:
             if provider_name == 'google':
                 # Use Google AI analyzer for chart analysis
                 analysis_text, change_analysis = self._analyze_with_google_ai(
-                    screenshot_data, output_dir, stock_symbol
+                    screenshot_data, output_dir, stock_symbol, image_data_uris=image_data_uris
                 )
             else:
+                if provider_name == 'perplexity' and self.perplexity_image_upload_url and image_data_uris:
+                    image_data_uris = self._hosted_image_urls(screenshot_data, image_data_uris)
+                
                 # Use custom provider (Perplexity, Claude, Grok, OpenAI, etc.) - skip prior analysis
                 analysis_text, change_analysis = self._analyze_with_custom_provider(
-                    screenshot_data, output_dir, stock_symbol, provider_name, prior_analysis=None
+                    screenshot_data, output_dir, stock_symbol, provider_name, prior_analysis=None,
+                    image_data_uris=image_data_uris
                 )
         except Exception as e:
             logger.error(f"Error running {provider_name} analysis: {e}")
@@ -974,6 +953,9 @@ class TradingAnalyzer:
         provider_names = list(self.providers.keys())
         logger.info(f"Starting parallel analysis with {len(provider_names)} providers: {provider_names}")
         
+        # Encode each screenshot once up front; every provider sends the same images
+        image_data_uris = self._encode_screenshots(filter_existing_files(screenshot_data))
+        
         with ThreadPoolExecutor(max_workers=len(provider_names)) as executor:
             # Submit all provider tasks
             future_to_provider = {
@@ -982,7 +964,8 @@ class TradingAnalyzer:
                     provider_name, 
                     screenshot_data, 
                     output_dir, 
-                    stock_symbol
+                    stock_symbol,
+                    image_data_uris
                 ): provider_name 
                 for provider_name in provider_names
             }
@@ -1024,8 +1007,6 @@ class TradingAnalyzer:
     
     def _combine_multi_provider_results(self, results: dict, screenshot_data: dict, output_dir: str, stock_symbol: str):
         """Combine results from multiple AI providers into a comprehensive analysis"""
-        from trading_analysis import logger
-
         # Create combined analysis report as HTML
         html = []
         html.append(f"""
@@ -1218,7 +1199,8 @@ class TradingAnalyzer:
             try:
                 from trading_analysis import EmailAlertManager
                 print("   [EMAIL] Google AI Consensus: Evaluating email alert...")
-                email_manager = EmailAlertManager()
+                # Delivered by a background thread so the analysis run isn't held up by SMTP
+                email_manager = EmailAlertManager(background=True)
                 
                 if email_manager.is_configured and consensus_change_analysis.get('has_changes', False):
                     print(f"   [EMAIL] Sending email alert from Google AI consensus")
@@ -1227,11 +1209,12 @@ class TradingAnalyzer:
                     
                     email_sent = email_manager.send_trend_alert(consensus_change_analysis, ''.join(html), stock_symbol, output_dir)
                     
+                    # Delivery happens later; SMTP failures are reported by the sender thread
                     if email_sent:
-                        print(f"   [OK] Email alert sent successfully from Google AI consensus")
+                        print(f"   [OK] Email alert queued from Google AI consensus")
                     else:
-                        print(f"   [WARN] Email alert failed to send")
-                        logger.warning("Google AI consensus email alert failed to send")
+                        print(f"   [WARN] Email alert could not be queued")
+                        logger.warning("Google AI consensus email alert could not be queued")
                 elif not email_manager.is_configured:
                     print("   [EMAIL] Email alerts not configured (check .env settings)")
                 else:
@@ -1241,8 +1224,8 @@ class TradingAnalyzer:
                 logger.error(f"Failed to send Google AI consensus email alert: {e}")
         except Exception as e:
             print(f"[ERROR] Failed to write HTML report for {stock_symbol}: {e}")
-            import traceback
-            traceback.print_exc()
+            if _DEBUG_TRACEBACKS:
+                traceback.print_exc()
             logger.error(f"Failed to write HTML report for {stock_symbol}: {e}")
         
         # Generate text version with provider headers for the txt file
@@ -1341,14 +1324,12 @@ class TradingAnalyzer:
         # Check for explicit YES/NO patterns first (highest priority)
         for pattern in yes_patterns:
             if pattern in decision_text:
-                from trading_analysis import logger
                 logger.info(f"Google AI email decision: SEND (matched pattern: '{pattern}')")
                 print(f"   [EMAIL] Google AI Decision: SEND EMAIL ALERT (matched: '{pattern}')")
                 return True
         
         for pattern in no_patterns:
             if pattern in decision_text:
-                from trading_analysis import logger
                 logger.info(f"Google AI email decision: DO NOT SEND (matched pattern: '{pattern}')")
                 print(f"   [EMAIL] Google AI Decision: NO EMAIL (matched: '{pattern}')")
                 return False
@@ -1363,20 +1344,17 @@ class TradingAnalyzer:
         
         # If there's a clear bias toward bullish signals AND the word "ALERT" or "SIGNAL" appears, likely should alert
         if ("ALERT" in decision_text or "SIGNAL" in decision_text) and (bullish_count > bearish_count):
-            from trading_analysis import logger
             logger.info("Google AI email decision: SEND (based on bullish signals and alert keywords)")
             print("   [EMAIL] Google AI Decision: SEND EMAIL ALERT (based on bullish signals)")
             return True
         
         # If there's significant bearish content with warning keywords, also alert
         if ("WARNING" in decision_text or "CAUTION" in decision_text) and bearish_count > 0:
-            from trading_analysis import logger
             logger.info("Google AI email decision: SEND (based on bearish warnings)")
             print("   [EMAIL] Google AI Decision: SEND EMAIL ALERT (based on bearish warnings)")
             return True
         
         # No clear pattern found - default to False for safety
-        from trading_analysis import logger
         logger.info("Google AI email decision: UNCLEAR (defaulting to NO)")
         print("   [WARN] Google AI Decision: UNCLEAR (defaulting to NO EMAIL)")
         return False
@@ -1393,8 +1371,8 @@ class TradingAnalyzer:
                 # Fall back to original logic if Google AI is not configured
                 return self._generate_local_consolidated_decision(results, avg_probability, all_alerts, stock_symbol)
             
-            # Initialize Google AI analyzer
-            google_analyzer = GoogleAIAnalyzer(google_api_key)
+            # Reuse the analyzer created at startup when there is one
+            google_analyzer = self.google_analyzer or GoogleAIAnalyzer(google_api_key)
             
             # Extract all provider analyses dynamically
             provider_analyses = {}
@@ -1470,24 +1448,26 @@ class TradingAnalyzer:
             consensus_decision = 'HOLD'
             decision_strength = f"{hold_votes}/{total_providers}"
         
-        # Generate consolidated report
-        consolidated_text = f"\n{'='*50}\n"
-        consolidated_text += f"LOCAL CONSOLIDATED TRADING DECISION FOR {stock_symbol}\n"
-        consolidated_text += f"{'='*50}\n\n"
-        
-        consolidated_text += f"TRADING DECISION: {consensus_decision}\n"
-        consolidated_text += f"Provider Consensus: {decision_strength} providers agree\n"
-        consolidated_text += f"Average Confidence: {avg_probability:.2f}\n\n"
-        
-        consolidated_text += "TREND CHANGE EVALUATION:\n"
+        # Generate consolidated report (collected in a list and joined once)
         if avg_probability > 0.6:
-            consolidated_text += f"High probability ({avg_probability:.1%}) of significant trend change\n"
+            trend_line = f"High probability ({avg_probability:.1%}) of significant trend change\n"
         elif avg_probability > 0.4:
-            consolidated_text += f"Moderate probability ({avg_probability:.1%}) of trend change\n"
+            trend_line = f"Moderate probability ({avg_probability:.1%}) of trend change\n"
         else:
-            consolidated_text += f"Low probability ({avg_probability:.1%}) of trend change\n"
+            trend_line = f"Low probability ({avg_probability:.1%}) of trend change\n"
+        
+        parts = [
+            "\n", _EQ50,
+            f"LOCAL CONSOLIDATED TRADING DECISION FOR {stock_symbol}\n",
+            _EQ50, "\n",
+            f"TRADING DECISION: {consensus_decision}\n",
+            f"Provider Consensus: {decision_strength} providers agree\n",
+            f"Average Confidence: {avg_probability:.2f}\n\n",
+            "TREND CHANGE EVALUATION:\n",
+            trend_line,
+            "\nProvider Breakdown:\n",
+        ]
         
-        consolidated_text += "\nProvider Breakdown:\n"
         for i, (provider_name, _, change_analysis) in enumerate(results):
             if i < len(recommendations):
                 rec = recommendations[i]
@@ -1497,17 +1477,19 @@ class TradingAnalyzer:
                     conf = change_analysis.get('trend_change_probability', avg_probability)
                 else:
                     conf = avg_probability
-                consolidated_text += f"- {provider_name}: {rec} (confidence: {conf:.2f})\n"
+                parts.append(f"- {provider_name}: {rec} (confidence: {conf:.2f})\n")
         
-        consolidated_text += f"\n{'='*50}\n"
+        parts.append("\n")
+        parts.append(_EQ50)
         
-        return consolidated_text
+        return "".join(parts)
     
-    def _analyze_with_google_ai(self, screenshot_data: dict, output_dir: str = None, stock_symbol: str = None):
+    def _analyze_with_google_ai(self, screenshot_data: dict, output_dir: str = None, stock_symbol: str = None,
+                                image_data_uris: dict = None):
         """Analyze charts with Google AI"""
         try:
-            # Filter out None/empty paths
-            valid_screenshots = {k: v for k, v in screenshot_data.items() if v and os.path.exists(v)}
+            # Filter out None/empty/missing paths
+            valid_screenshots = filter_existing_files(screenshot_data)
             
             if not valid_screenshots:
                 logger.warning("No valid screenshots found for Google AI analysis")
@@ -1515,14 +1497,9 @@ class TradingAnalyzer:
             
             print(f"   [AI] Analyzing {len(valid_screenshots)} screenshots with Google AI...")
             
-            # Encode all images
-            image_data_uris = {}
-            for window_type, image_path in valid_screenshots.items():
-                try:
-                    image_data_uris[window_type] = self.google_analyzer.encode_image_to_base64(image_path)
-                except Exception as e:
-                    logger.error(f"Failed to encode {window_type} image for Google AI: {e}")
-                    continue
+            # Encode all images (unless already encoded for all providers)
+            if image_data_uris is None:
+                image_data_uris = self._encode_screenshots(valid_screenshots)
             
             if not image_data_uris:
                 logger.error("Failed to encode any images for Google AI analysis")
@@ -1530,113 +1507,14 @@ class TradingAnalyzer:
             
             # Create analysis prompt for Google AI - SAME AS PERPLEXITY/CLAUDE
             window_types = list(image_data_uris.keys())
-            symbol_text = f" for {stock_symbol}" if stock_symbol else ""
-            email_threshold = int(os.getenv('EMAIL_ALERT_THRESHOLD', '60'))
+            # Symbol goes at the end so the instruction prefix is shared across symbols
+            symbol_line = f"\nThese charts are for {stock_symbol}.\n" if stock_symbol else ""
             
-            # Create chart-specific context (same as Perplexity)
-            chart_context = ""
-            if 'trend_analysis' in window_types:
-                chart_context += """
-CHART CONTEXT - Trend Analysis Window:
-This chart displays LuxAlgo technical indicators. Use the following documentation to analyze it:
-- LuxAlgo Signals & Overlays: https://docs.luxalgo.com/docs/algos/signals-overlays/signals
-- LuxAlgo Price Action Concepts: https://docs.luxalgo.com/docs/algos/price-action-concepts/introduction
-
-Pay special attention to:
-- Signal Quality (Strong Buy/Sell signals)
-- Price Action Concepts (Support/Resistance levels, market structure)
-- Overlay indicators (trend direction, strength)
-- Signal confirmations and divergences
-
-"""
-            
-            if 'heiken_ashi' in window_types:
-                chart_context += """
-CHART CONTEXT - Smoothed Heiken Ashi Candles Window:
-This chart displays the following technical indicators:
-- Smoothed Heiken Ashi Candles: Trend-following candles that smooth out price action
-- AlgoAlpha HEMA Trend: Hybrid Exponential Moving Average for trend identification
-- Divergence Indicators: Price vs indicator divergences for reversal signals
-- Volume Footprint: Order flow analysis showing buy/sell volume at each price level
-
-Pay special attention to:
-- Smoothed Heiken Ashi candle colors (bullish/bearish trends)
-- HEMA trend direction and crossovers
-- Divergence signals (bullish/bearish divergences)
-- Trend strength and momentum
-- Reversal patterns indicated by divergences
-- Volume Footprint Analysis:
-  * Absorption: Large volume at price level with minimal price movement indicates strong institutional support/resistance
-  * Exhaustion: Decreasing volume as price extends signals trend weakness and potential reversal
-  * Bid/ask imbalances at key levels for order flow confirmation
-
-"""
-            
-            if 'volume_layout' in window_types:
-                chart_context += """
-CHART CONTEXT - Volume Layout Window:
-This chart displays the following technical indicators:
-- LuxAlgo Money Flow Profile: Shows institutional money flow and buying/selling pressure
-- CVD Divergence Oscillator: Cumulative Volume Delta divergences for trend reversals
-- SQZMOM_LB: Squeeze Momentum indicator with LazyBear modifications
-- MA Distance with StdDev Bands: Moving average distance with standard deviation bands
-
-Pay special attention to:
-- Money flow profile (accumulation/distribution zones)
-- CVD divergence signals (bullish/bearish divergences)
-- SQZMOM_LB squeeze conditions and momentum direction
-- MA distance from price and standard deviation extremes
-- **CRITICAL**: If a +RD (Positive Reversal Divergence) or -RD (Negative Reversal Divergence) was formed recently, clearly indicate this in the analysis as it signals potential trend reversal
-- Volume patterns confirming or diverging from price action
-
-"""
-            
-            if 'utbot' in window_types or 'ut bot' in str(window_types).lower() or 'lorentzian' in str(window_types).lower():
-                chart_context += """
-CHART CONTEXT - UT Bot -Lorentzian Window:
-This chart displays the following technical indicators:
-- UT Bot Alert: Trend-following indicator with BUY/SELL signals based on ATR trailing stop
-- Lorentzian Classification: Machine learning-based trend classification using Lorentzian distance
-- Signal Line: Dynamic support/resistance based on ATR
-- Trend Direction: Color-coded candles showing bullish (green) or bearish (red) trend
-
-Pay special attention to:
-- UT Bot BUY/SELL signals (triangles or arrows marking entry points)
-- Lorentzian classification predictions (bullish/bearish probability)
-- Signal line crossovers (price crossing above/below the UT Bot line)
-- Trend color changes (transition from red to green or vice versa)
-- Confluence of UT Bot signals with Lorentzian predictions
-- Recent signal history and signal frequency
-- ATR-based stop loss levels indicated by the trailing line
-
-"""
-            
-            if 'workspace' in window_types:
-                chart_context += """
-CHART CONTEXT - Symbolik Workspace Window:
-This chart displays the following technical indicators:
-- ATM Chart Lines: Algorithmic Trading Model support/resistance lines
-- ATM Elliott Projections: Elliott Wave price projections and targets
-- ATM Elliott Waves: Elliott Wave count and structure analysis
-- ATM Pressure Alert: Market pressure and momentum alerts
-- TKT Analysis: Technical Knowledge Trading analysis framework
-- TKT Score: Quantified trading opportunity score
-- Variable Aggressive Sequential (Demark Sequential): TD Sequential buy/sell setup and countdown signals
-
-Pay special attention to:
-- **ATM Chart Lines alignment**: If the current price is sitting on or near an ATM chart line, clearly indicate this in the analysis as it represents a key support/resistance level
-- ATM Elliott Wave count and current position in the wave structure
-- ATM Elliott projections for price targets
-- ATM Pressure alerts (bullish/bearish pressure signals)
-- TKT analysis signals and overall market structure
-- TKT score value (higher scores indicate stronger opportunities)
-- Variable Aggressive Sequential setup and countdown numbers (9s and 13s are critical)
-- Demark Sequential buy/sell signals at exhaustion points
-
-"""
+            # Chart-specific context comes from the shared prompt constants
+            chart_context = get_chart_context(window_types)
             
             prompt = f"""
-You are an expert stock market analyst. Analyze these {len(window_types)} chart screenshots{symbol_text}.
+You are an expert stock market analyst. Analyze these {len(window_types)} chart screenshots.
 
 CRITICAL INSTRUCTION: Only analyze what you can clearly see in the screenshots. If a chart window appears blank, contains no data, or is not loaded properly, explicitly state "Chart not loaded" or "No data visible" for that window. DO NOT make assumptions or provide analysis for charts that are not visible or contain no data.
 
@@ -1663,7 +1541,7 @@ Clear BUY/SELL/HOLD with rationale
 
 **TREND CHANGE EVALUATION**
 Assess probability of significant trend change or reversal in the short term (0-100%). Explain what indicators suggest this.
-"""
+{symbol_line}"""
             
             # Build content array with text prompt and all images
             content = [{"type": "text", "text": prompt}]
@@ -1696,16 +1574,14 @@ Assess probability of significant trend change or reversal in the short term (0-
             
         except Exception as e:
             logger.error(f"Google AI chart analysis error: {e}")
-            import traceback
-            traceback.print_exc()
+            if _DEBUG_TRACEBACKS:
+                traceback.print_exc()
             return None, None
     
-    def _analyze_with_custom_provider(self, screenshot_data: dict, output_dir: str = None, stock_symbol: str = None, provider_name: str = 'claude', prior_analysis: str = None):
+    def _analyze_with_custom_provider(self, screenshot_data: dict, output_dir: str = None, stock_symbol: str = None, provider_name: str = 'claude', prior_analysis: str = None,
+                                      image_data_uris: dict = None):
         """Analyze using custom AI provider (Claude, etc.)"""
         try:
-            # Import necessary components
-            from trading_analysis import logger
-            
             # Get the specific AI provider
             ai_provider = self.providers.get(provider_name)
             if not ai_provider:
@@ -1713,7 +1589,7 @@ Assess probability of significant trend change or reversal in the short term (0-
                 return None, None
             
             # Filter out None/empty paths (same as original)
-            valid_screenshots = {k: v for k, v in screenshot_data.items() if v and os.path.exists(v)}
+            valid_screenshots = filter_existing_files(screenshot_data)
             
             if not valid_screenshots:
                 logger.warning("No valid screenshots found for analysis")
@@ -1725,24 +1601,19 @@ Assess probability of significant trend change or reversal in the short term (0-
             else:
                 print(f"   [DATA] Analyzing current state only (no prior comparison)")
 
-            # Encode all images using our AI provider
-            image_data_uris = {}
-            for window_type, image_path in valid_screenshots.items():
-                try:
-                    image_data_uris[window_type] = ai_provider.encode_image_to_base64(image_path)
-                except Exception as e:
-                    logger.error(f"Failed to encode {window_type} image {image_path}: {e}")
-                    continue
+            # Encode all images (unless already encoded for all providers)
+            if image_data_uris is None:
+                image_data_uris = self._encode_screenshots(valid_screenshots)
             
             if not image_data_uris:
                 logger.error("Failed to encode any images")
                 return None, None
             
-            # Create prompt using original method
-            prompt = self.original_analyzer._create_analysis_prompt(list(image_data_uris.keys()), prior_analysis, stock_symbol)
+            # Create prompt split into a cacheable system prefix and a per-symbol tail
+            system_prompt, prompt = get_analysis_prompt_parts(list(image_data_uris.keys()), prior_analysis, stock_symbol)
             
             # Build messages for AI provider
-            messages = self._build_messages_for_provider(prompt, image_data_uris)
+            messages = self._build_messages_for_provider(prompt, image_data_uris, system_prompt)
             
             print(f"   [AI] Analyzing {len(image_data_uris)} screenshots with {provider_name.title()}...")
             
@@ -1769,10 +1640,68 @@ Assess probability of significant trend change or reversal in the short term (0-
             logger.error(f"Error in {provider_name} analysis: {e}")
             return None, None
     
-    def _build_messages_for_provider(self, prompt: str, image_data_uris: dict) -> list:
+    def _encode_screenshots(self, valid_screenshots: dict) -> dict:
+        """
+        Encode screenshots to base64 data URIs, downscaled to IMAGE_MAX_DIMENSION
+        
+        Args:
+            valid_screenshots: Dict of {window_type: image_path} for existing files
+            
+        Returns:
+            Dict of {window_type: data_uri} for the images that encoded successfully
+        """
+        if not valid_screenshots:
+            return {}
+        
+        # Encode concurrently to overlap file reads and hashing, which release the
+        # GIL (as does pybase64 when installed; the binascii fallback does not)
+        with ThreadPoolExecutor(max_workers=min(8, len(valid_screenshots))) as executor:
+            futures = {
+                window_type: executor.submit(self._encode_screenshot, image_path)
+                for window_type, image_path in valid_screenshots.items()
+            }
+        
+        image_data_uris = {}
+        for window_type, future in futures.items():
+            try:
+                image_data_uris[window_type] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to encode {window_type} image {valid_screenshots[window_type]}: {e}")
+        return image_data_uris
+    
+    def _hosted_image_urls(self, screenshot_data: dict, image_data_uris: dict) -> dict:
+        """
+        Upload screenshots to PERPLEXITY_IMAGE_UPLOAD_URL for providers that accept image URLs
+        
+        Args:
+            screenshot_data: Dict of {window_type: image_path}
+            image_data_uris: Dict of {window_type: data_uri} from _encode_screenshots
+            
+        Returns:
+            Dict of {window_type: image_url}, keeping the data URI for any failed upload
+        """
+        image_urls = {}
+        for window_type, data_uri in image_data_uris.items():
+            image_path = screenshot_data[window_type]
+            try:
+                image_urls[window_type] = upload_image(
+                    downscale_image(image_path) or image_path, self.perplexity_image_upload_url
+                )
+            except Exception as e:
+                logger.warning(f"Image upload failed for {image_path}, sending inline instead: {e}")
+                image_urls[window_type] = data_uri
+        return image_urls
+    
+    @staticmethod
+    def _encode_screenshot(image_path: str) -> str:
+        """Encode one screenshot as a data URI, downscaling it first when oversized"""
+        downscaled = downscale_image(image_path)
+        return encode_image_to_base64(downscaled or image_path)
+    
+    def _build_messages_for_provider(self, prompt: str, image_data_uris: dict, system_prompt: str = None) -> list:
         """Build messages compatible with different AI providers"""
-        # For Claude, we don't use system messages in the messages array
-        # The system prompt is handled separately
+        # For Claude, the system message is lifted out of the messages array
+        # by ClaudeAnalyzer and sent as a cached system prompt
         
         # Build content array with text prompt and all images
         content = [{"type": "text", "text": prompt}]
@@ -1784,7 +1713,10 @@ Assess probability of significant trend change or reversal in the short term (0-
                 "image_url": {"url": image_uri}
             })
         
-        return [{"role": "user", "content": content}]
+        messages = [{"role": "user", "content": content}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        return messages
     
     def _handle_alerts(self, change_analysis: dict, analysis_text: str, stock_symbol: str, output_dir: str, provider_name: str = None):
         """Handle alert display and email notifications"""
@@ -1,6 +1,9 @@
 """Configuration constants for desktop_auto project"""
 import os
 import sys
+from dataclasses import dataclass
+from typing import Dict
+
 from dotenv import load_dotenv
 
 # Determine project root - always points to desktop_auto folder
@@ -94,6 +97,53 @@ class Screenshots:
     TAB3 = os.getenv('SCREENSHOT_NAME_TAB3', '{symbol}_volume_layout.png')
     TAB4 = os.getenv('SCREENSHOT_NAME_TAB4', '{symbol}_utbot.png')
     SYMBOLIK = os.getenv('SCREENSHOT_NAME_SYMBOLIK', '{symbol}_symbolik.png')
+    # zlib level for saved PNGs (0-9); defaults to Pillow's 6, lower saves
+    # faster but produces larger files to upload
+    PNG_COMPRESS_LEVEL = int(os.getenv('SCREENSHOT_PNG_COMPRESS_LEVEL', '6'))
+
+
+@dataclass(frozen=True)
+class SymbolPaths:
+    """Screenshot paths for one symbol, built once per symbol"""
+    folder: str
+    trend_analysis: str
+    heiken_ashi: str
+    volume_layout: str
+    utbot: str
+    workspace: str
+    
+    @classmethod
+    def for_symbol(cls, screenshot_dir: str, symbol: str, tab1: str, tab2: str,
+                   tab3: str, tab4: str, symbolik: str) -> "SymbolPaths":
+        """
+        Build the paths for a symbol from the screenshot filename patterns
+        
+        Args:
+            screenshot_dir: Root screenshots directory
+            symbol: Stock symbol
+            tab1, tab2, tab3, tab4, symbolik: Filename patterns (use {symbol})
+        """
+        folder = f"{screenshot_dir}/{symbol}"
+        return cls(
+            folder=folder,
+            trend_analysis=os.path.join(folder, tab1.format(symbol=symbol)),
+            heiken_ashi=os.path.join(folder, tab2.format(symbol=symbol)),
+            volume_layout=os.path.join(folder, tab3.format(symbol=symbol)),
+            utbot=os.path.join(folder, tab4.format(symbol=symbol)),
+            workspace=os.path.join(folder, symbolik.format(symbol=symbol)),
+        )
+    
+    def screenshot_data(self, tradingview: bool = True, symbolik: bool = True) -> Dict[str, str]:
+        """Map analysis window types to screenshot paths for the enabled sources"""
+        data = {}
+        if tradingview:
+            data['trend_analysis'] = self.trend_analysis
+            data['heiken_ashi'] = self.heiken_ashi
+            data['volume_layout'] = self.volume_layout
+            data['utbot'] = self.utbot
+        if symbolik:
+            data['workspace'] = self.workspace
+        return data
 
 
 # API configuration
@@ -3,6 +3,7 @@
 Desktop Auto Project - TradingView Automation for 4 Separate Windows
 """
 # Standard library imports
+import logging
 import os
 import sys
 import time
@@ -14,7 +15,7 @@ pyautogui.FAILSAFE = False
 from dotenv import load_dotenv
 
 # Local imports
-from config import Coordinates, Defaults, Paths, Windows, Screenshots
+from config import Coordinates, Defaults, Paths, Windows, Screenshots, SymbolPaths
 
 try:
     import pytz
@@ -241,7 +242,7 @@ def process_window(
     filepath = os.path.join(folder, filename)
     
     screenshot = pyautogui.screenshot()
-    screenshot.save(filepath)
+    screenshot.save(filepath, compress_level=Screenshots.PNG_COMPRESS_LEVEL)
     log(f"[OK] Saved: {filepath}")
     return True
 
@@ -326,7 +327,7 @@ def process_symbolik(
         stat = ImageStat.Stat(screenshot)
         if all(m > 240 for m in stat.mean[:3]):
             log(f"  [WARN] Still blank after refresh. Saving anyway.")
-    screenshot.save(filepath)
+    screenshot.save(filepath, compress_level=Screenshots.PNG_COMPRESS_LEVEL)
     log(f"[OK] Saved: {filepath}")
     return True
 
@@ -392,15 +393,18 @@ def main() -> None:
             log(f"Processing symbol: {symbol}")
             log(f"{'='*60}")
             
-            # Create screenshot folder
-            folder = f"{screenshot_dir}/{symbol}"
+            # Build this symbol's screenshot paths once and create its folder
+            paths = SymbolPaths.for_symbol(
+                screenshot_dir, symbol, screenshot_name_tab1, screenshot_name_tab2,
+                screenshot_name_tab3, screenshot_name_tab4, screenshot_name_symbolik
+            )
+            folder = paths.folder
             os.makedirs(folder, exist_ok=True)
             
             # Process TradingView windows if enabled
             if tradingview_enabled:
                 # Check if we should reuse existing screenshots for Tab 1
-                filename = screenshot_name_tab1.format(symbol=symbol)
-                filepath = os.path.join(folder, filename)
+                filepath = paths.trend_analysis
                 reuse_screenshots = os.getenv('REUSE_EXISTING_SCREENSHOTS', 'False').lower() == 'true'
                 if reuse_screenshots and os.path.exists(filepath):
                     log(f"\n[REUSE] Tab 1: Reusing existing screenshot: {filepath}")
@@ -426,11 +430,8 @@ def main() -> None:
                     time.sleep(chart_load_delay_tabs1_3)
                     # Take screenshot for tab 1
                     log(f"[SCREENSHOT] Taking screenshot for Tab 1...")
-                    filename = screenshot_name_tab1.format(symbol=symbol)
-                    filepath = os.path.join(folder, filename)
-                    
                     screenshot = pyautogui.screenshot()
-                    screenshot.save(filepath)
+                    screenshot.save(filepath, compress_level=Screenshots.PNG_COMPRESS_LEVEL)
                     log(f"[OK] Saved: {filepath}")
                 
                 # Process remaining windows
@@ -462,18 +463,8 @@ def main() -> None:
                 try:
                     log(f"\n[AI] Starting AI analysis for {symbol}...")
                     
-                    # Build screenshot data dictionary
-                    screenshot_data = {}
-                    
-                    if tradingview_enabled:
-                        # Map TradingView windows to analysis types
-                        screenshot_data['trend_analysis'] = os.path.join(folder, screenshot_name_tab1.format(symbol=symbol))
-                        screenshot_data['heiken_ashi'] = os.path.join(folder, screenshot_name_tab2.format(symbol=symbol))
-                        screenshot_data['volume_layout'] = os.path.join(folder, screenshot_name_tab3.format(symbol=symbol))
-                        screenshot_data['utbot'] = os.path.join(folder, screenshot_name_tab4.format(symbol=symbol))
-                    
-                    if symbolik_enabled:
-                        screenshot_data['workspace'] = os.path.join(folder, screenshot_name_symbolik.format(symbol=symbol))
+                    # Map TradingView/Symbolik windows to analysis types
+                    screenshot_data = paths.screenshot_data(tradingview_enabled, symbolik_enabled)
                     
                     # Initialize analyzer based on individual provider enable flags
                     if AI_ANALYSIS_AVAILABLE:
@@ -613,5 +604,6 @@ def run_scheduled() -> None:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     run_scheduled()
 
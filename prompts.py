@@ -8,8 +8,17 @@ To customize prompts:
 3. Edit CONSOLIDATION_PROMPT for Google AI consensus logic
 """
 
+import functools
 import os
-from typing import Dict, Optional
+import string
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+# Email alert threshold embedded in the trend evaluation prompt (read once)
+_EMAIL_THRESHOLD = int(os.getenv('EMAIL_ALERT_THRESHOLD', '60'))
+
+# Number of characters of the prior analysis quoted in the trend prompt
+_PRIOR_ANALYSIS_CHARS = 500
 
 # ============================================================================
 # CHART-SPECIFIC CONTEXT PROMPTS
@@ -17,7 +26,7 @@ from typing import Dict, Optional
 # Each key corresponds to a window type in the screenshot_data dictionary
 # Add or modify chart contexts as needed
 
-CHART_CONTEXTS: Dict[str, str] = {
+CHART_CONTEXTS: Mapping[str, str] = {
     "trend_analysis": """
 CHART CONTEXT - Trend Analysis Window:
 This chart displays LuxAlgo technical indicators. Use the following documentation to analyze it:
@@ -212,13 +221,8 @@ This is the INITIAL ANALYSIS.
 CONSOLIDATION_PROMPT = """
 You are an expert financial analyst tasked with creating a consolidated trading decision based on analyses from multiple AI providers.
 
-**SYMBOL:** {symbol}
-
-**INDIVIDUAL AI PROVIDER ANALYSES:**
-{all_analyses}
-
 **YOUR TASK:**
-1. Review all provider analyses above
+1. Review all provider analyses below
 2. Identify consensus and disagreements
 3. Weight the most reliable signals
 4. Create a FINAL consolidated analysis
@@ -263,12 +267,155 @@ If YES, the email should highlight:
 - Key support/resistance levels
 - Recommended action
 - Risk considerations
+
+**SYMBOL:** {symbol}
+
+**INDIVIDUAL AI PROVIDER ANALYSES:**
+{all_analyses}
+"""
+
+# Fixed instructions for the multi-provider consolidation. The symbol, provider
+# analyses and prior analysis are appended after it so the prompt prefix stays
+# identical across symbols. This only prepares for prompt caching: the prefix
+# is about 540 tokens, below Gemini's implicit-cache minimum (1024+ tokens), so
+# it is not cached today
+MULTI_CONSOLIDATION_PROMPT = """
+You are an expert financial analyst tasked with creating a consolidated trading decision based on analyses from multiple AI providers. The stock symbol, the individual provider analyses and any prior analysis are given at the end of this prompt.
+
+Instructions:
+1. Synthesize all analyses into a coherent trading decision
+2. Highlight areas of agreement and disagreement
+3. Provide specific price targets and risk levels when mentioned
+4. Be objective and balanced in your assessment
+5. Focus on actionable trading insights
+6. Email alerts should be sent for significant changes that traders need to act on
+
+Generate a consolidated trading decision with the following format:
+
+==================================================
+CONSOLIDATED TRADING DECISION FOR [STOCK SYMBOL]
+==================================================
+
+TRADING DECISION: [BUY/SELL/HOLD]
+Consensus Assessment: [Describe agreement/disagreement between providers]
+Overall Confidence: [Provide a confidence percentage 0-100%]
+
+TREND CHANGE EVALUATION:
+[Synthesize the trend change probability from all analyses]
+[Provide consolidated probability assessment]
+[Explain key factors driving the trend evaluation]
+
+CRITICAL FACTORS:
+- [List 3-5 most important technical factors from all analyses]
+- [Highlight any conflicting signals between providers]
+- [Note volume, momentum, and support/resistance levels]
+
+RISK ASSESSMENT:
+- Upside Potential: [Based on resistance levels and bullish signals]
+- Downside Risk: [Based on support levels and bearish signals]
+- Stop Loss Recommendation: [If applicable]
+
+PROVIDER SYNTHESIS:
+- [Provider] Focus: [Summarize key points, one line for each provider listed below]
+- Agreement Areas: [Where providers align]
+- Disagreement Areas: [Where providers differ]
+
+EMAIL ALERT DECISION:
+Based on the analysis above, determine if an email alert should be sent.
+Consider:
+- Trend change probability (higher probability = more likely to send)
+- Alert levels from all providers
+- Significance of changes detected
+- Trading decision confidence
+
+Clearly state: EMAIL ALERT DECISION: YES or EMAIL ALERT DECISION: NO
+
+==================================================
 """
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+_FORMATTER = string.Formatter()
+
+# Chart context lookup state (filled by _build_chart_context_table):
+# each CHART_CONTEXTS key gets a bit id, a window-type set becomes a bitmask
+_UTBOT_ALIASES = ("ut bot", "lorentzian")
+_CHART_IDS: Dict[str, int] = {}
+_CHART_CONTEXT_ARRAY: Tuple[str, ...] = ()
+_WINDOW_MASKS: Dict[str, int] = {}
+_CHART_CONTEXT_TABLE: Dict[int, str] = {}
+_MAX_PRECOMPUTED_CHART_KEYS = 8
+
+# Heading that closes BASE_ANALYSIS_PROMPT and introduces the trend evaluation;
+# get_analysis_prompt_parts moves it to the dynamic part with the trend text
+_TREND_HEADING = "**TREND CHANGE EVALUATION**"
+_TREND_HEADING_TEXT = ""
+
+
+def _compile_template(template: str) -> tuple:
+    """
+    Pre-parse a str.format template into (literal, field, spec, conversion) chunks
+    
+    Args:
+        template: Template string using str.format placeholders
+    
+    Returns:
+        Tuple of parsed chunks, to be rendered with _render_template
+    """
+    return tuple(_FORMATTER.parse(template))
+
+
+def _render_template(chunks: tuple, values: Dict[str, object]) -> str:
+    """
+    Render a template compiled by _compile_template (equivalent to str.format)
+    
+    Args:
+        chunks: Compiled template chunks
+        values: Placeholder values by field name
+    
+    Returns:
+        Rendered string
+    """
+    parts = []
+    for literal, field, spec, conversion in chunks:
+        parts.append(literal)
+        if field is not None:
+            value = values[field]
+            if conversion:
+                value = _FORMATTER.convert_field(value, conversion)
+            parts.append(format(value, spec))
+    return "".join(parts)
+
+
+def _compile_prompts():
+    """Compile the formatted prompt templates (called again when prompts are overridden)"""
+    global _BASE_ANALYSIS_CHUNKS, _TREND_HEADING_TEXT, _TREND_EVAL_WITH_PRIOR_CHUNKS, _CONSOLIDATION_CHUNKS
+    base_prompt, heading, tail = BASE_ANALYSIS_PROMPT.rpartition(_TREND_HEADING)
+    if heading and not tail.strip():
+        _BASE_ANALYSIS_CHUNKS = _compile_template(base_prompt)
+        _TREND_HEADING_TEXT = heading + tail
+    else:
+        # Custom base prompt without a trailing trend heading: keep it whole
+        _BASE_ANALYSIS_CHUNKS = _compile_template(BASE_ANALYSIS_PROMPT)
+        _TREND_HEADING_TEXT = ""
+    _TREND_EVAL_WITH_PRIOR_CHUNKS = _compile_template(TREND_EVAL_WITH_PRIOR)
+    _CONSOLIDATION_CHUNKS = _compile_template(CONSOLIDATION_PROMPT)
+    _get_trend_prompt.cache_clear()
+
+
+def set_email_threshold(threshold: int):
+    """
+    Override the email alert threshold used in trend evaluation prompts
+    
+    Args:
+        threshold: Confidence threshold (0-100)
+    """
+    global _EMAIL_THRESHOLD
+    _EMAIL_THRESHOLD = int(threshold)
+
+
 def get_chart_context(window_types: list) -> str:
     """
     Build chart context string from window types
@@ -279,19 +426,75 @@ def get_chart_context(window_types: list) -> str:
     Returns:
         Combined chart context string
     """
-    chart_context = ""
-    window_types_lower = [w.lower() for w in window_types]
-    window_types_str = str(window_types).lower()
+    mask = 0
+    for window_type in window_types:
+        mask |= _window_mask(window_type)
     
-    for key, context in CHART_CONTEXTS.items():
-        # Check if this chart type is in the window types
-        if key in window_types_lower:
-            chart_context += context + "\n"
+    context = _CHART_CONTEXT_TABLE.get(mask)
+    if context is None:
+        context = _CHART_CONTEXT_TABLE[mask] = _build_chart_context(mask)
+    return context
+
+
+def _window_mask(window_type: str) -> int:
+    """Map a window type name to its CHART_CONTEXTS bitmask (memoized per name)"""
+    mask = _WINDOW_MASKS.get(window_type)
+    if mask is None:
+        name = window_type.lower()
+        chart_id = _CHART_IDS.get(name)
+        mask = 0 if chart_id is None else 1 << chart_id
+        
         # Special handling for utbot variations
-        elif key == "utbot" and ("ut bot" in window_types_str or "lorentzian" in window_types_str):
-            chart_context += context + "\n"
+        utbot_id = _CHART_IDS.get("utbot")
+        if utbot_id is not None and any(alias in name for alias in _UTBOT_ALIASES):
+            mask |= 1 << utbot_id
+        
+        _WINDOW_MASKS[window_type] = mask
+    return mask
+
+
+def _build_chart_context(mask: int) -> str:
+    """Build the chart context for a CHART_CONTEXTS bitmask"""
+    return "".join(context for chart_id, context in enumerate(_CHART_CONTEXT_ARRAY)
+                   if mask >> chart_id & 1)
+
+
+def _build_chart_context_table():
+    """Assign chart ids and precompute the context for every bitmask"""
+    global _CHART_IDS, _CHART_CONTEXT_ARRAY, _WINDOW_MASKS, _CHART_CONTEXT_TABLE
+    _CHART_IDS = {key: chart_id for chart_id, key in enumerate(CHART_CONTEXTS)}
+    _CHART_CONTEXT_ARRAY = tuple(context + "\n" for context in CHART_CONTEXTS.values())
+    _WINDOW_MASKS = {}
+    
+    table = {}
+    # Only enumerate when the combination count stays small; misses are filled lazily
+    if len(_CHART_IDS) <= _MAX_PRECOMPUTED_CHART_KEYS:
+        for mask in range(1 << len(_CHART_IDS)):
+            table[mask] = _build_chart_context(mask)
+    _CHART_CONTEXT_TABLE = table
+
+
+@functools.lru_cache(maxsize=8)
+def _get_trend_prompt(prior_analysis: Optional[str], email_threshold: int) -> str:
+    """
+    Build the trend evaluation part of the prompt
+    
+    Memoized on the prior analysis text: every provider in a cycle is given
+    the same prior report, so it is truncated and rendered once.
+    
+    Args:
+        prior_analysis: Optional previous analysis for comparison
+        email_threshold: Email alert confidence threshold
     
-    return chart_context
+    Returns:
+        Trend evaluation prompt string
+    """
+    if not prior_analysis:
+        return TREND_EVAL_INITIAL
+    return _render_template(_TREND_EVAL_WITH_PRIOR_CHUNKS, {
+        "prior_analysis": prior_analysis[:_PRIOR_ANALYSIS_CHARS],
+        "email_threshold": email_threshold
+    })
 
 
 def get_analysis_prompt(window_types: list, prior_analysis: Optional[str] = None, 
@@ -305,28 +508,41 @@ def get_analysis_prompt(window_types: list, prior_analysis: Optional[str] = None
         stock_symbol: Optional stock symbol
     
     Returns:
-        Complete formatted prompt string
+        Complete formatted prompt string (both parts of get_analysis_prompt_parts)
+    """
+    return "".join(get_analysis_prompt_parts(window_types, prior_analysis, stock_symbol))
+
+
+def get_analysis_prompt_parts(window_types: list, prior_analysis: Optional[str] = None,
+                             stock_symbol: Optional[str] = None) -> Tuple[str, str]:
     """
-    symbol_text = f" for {stock_symbol}" if stock_symbol else ""
-    email_threshold = int(os.getenv('EMAIL_ALERT_THRESHOLD', '60'))
+    Generate the analysis prompt split into a static and a dynamic part
     
-    chart_context = get_chart_context(window_types)
+    The static part (base instructions + chart contexts) only depends on the
+    window types, so it is identical across symbols and cycles and can be
+    sent as a cached system prompt. The dynamic part carries the symbol line,
+    then the trend evaluation heading with the prior analysis and email
+    threshold, so joining the two keeps the sections in their original order.
     
-    base_prompt = BASE_ANALYSIS_PROMPT.format(
-        num_charts=len(window_types),
-        symbol_text=symbol_text,
-        chart_context=chart_context
-    )
+    Args:
+        window_types: List of chart window types
+        prior_analysis: Optional previous analysis for comparison
+        stock_symbol: Optional stock symbol
     
-    if prior_analysis:
-        trend_prompt = TREND_EVAL_WITH_PRIOR.format(
-            prior_analysis=prior_analysis[:500],
-            email_threshold=email_threshold
-        )
-    else:
-        trend_prompt = TREND_EVAL_INITIAL
+    Returns:
+        Tuple of (static system prompt, dynamic user prompt)
+    """
+    static_prompt = _render_template(_BASE_ANALYSIS_CHUNKS, {
+        "num_charts": len(window_types),
+        "symbol_text": "",
+        "chart_context": get_chart_context(window_types)
+    })
+    
+    trend_prompt = _get_trend_prompt(prior_analysis, _EMAIL_THRESHOLD)
     
-    return base_prompt + trend_prompt
+    symbol_line = f"These charts are for {stock_symbol}.\n\n" if stock_symbol else ""
+    
+    return static_prompt, symbol_line + _TREND_HEADING_TEXT + trend_prompt
 
 
 def get_consolidation_prompt(symbol: str, all_analyses: str) -> str:
@@ -340,10 +556,10 @@ def get_consolidation_prompt(symbol: str, all_analyses: str) -> str:
     Returns:
         Formatted consolidation prompt
     """
-    return CONSOLIDATION_PROMPT.format(
-        symbol=symbol,
-        all_analyses=all_analyses
-    )
+    return _render_template(_CONSOLIDATION_CHUNKS, {
+        "symbol": symbol,
+        "all_analyses": all_analyses
+    })
 
 
 # ============================================================================
@@ -357,6 +573,8 @@ def load_custom_prompts():
     Load custom prompts from prompts_custom.py if it exists
     This allows users to override default prompts without modifying this file
     """
+    global CHART_CONTEXTS, BASE_ANALYSIS_PROMPT, CONSOLIDATION_PROMPT
+    
     try:
         from prompts_custom import (
             CHART_CONTEXTS as CUSTOM_CHART_CONTEXTS,
@@ -364,10 +582,8 @@ def load_custom_prompts():
             CONSOLIDATION_PROMPT as CUSTOM_CONSOLIDATION_PROMPT
         )
         
-        global CHART_CONTEXTS, BASE_ANALYSIS_PROMPT, CONSOLIDATION_PROMPT
-        
         if CUSTOM_CHART_CONTEXTS:
-            CHART_CONTEXTS.update(CUSTOM_CHART_CONTEXTS)
+            CHART_CONTEXTS = {**CHART_CONTEXTS, **CUSTOM_CHART_CONTEXTS}
         if CUSTOM_BASE_PROMPT:
             BASE_ANALYSIS_PROMPT = CUSTOM_BASE_PROMPT
         if CUSTOM_CONSOLIDATION_PROMPT:
@@ -376,6 +592,11 @@ def load_custom_prompts():
         print("[CONFIG] Loaded custom prompts from prompts_custom.py")
     except ImportError:
         pass  # No custom prompts file, use defaults
+    
+    # Read-only from here on
+    CHART_CONTEXTS = MappingProxyType(dict(CHART_CONTEXTS))
+    _compile_prompts()
+    _build_chart_context_table()
 
 
 # Load custom prompts on module import
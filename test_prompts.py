@@ -0,0 +1,49 @@
+"""
+Tests for the analysis prompt builders in prompts.py
+"""
+import unittest
+
+import prompts
+
+WINDOW_TYPES = ["trend analysis", "volume layout"]
+
+
+class AnalysisPromptOrderTest(unittest.TestCase):
+    """get_analysis_prompt must keep the baseline section order"""
+
+    def test_sections_in_baseline_order(self):
+        prompt = prompts.get_analysis_prompt(WINDOW_TYPES, "Prior analysis text", "AAPL")
+
+        markers = [
+            "You are an expert stock market analyst",
+            "**TRADING DECISION**",
+            "These charts are for AAPL.",
+            "**TREND CHANGE EVALUATION**",
+            "Compare with prior analysis",
+            "**RESPONSE FORMAT:**",
+        ]
+        positions = [prompt.find(marker) for marker in markers]
+        self.assertNotIn(-1, positions)
+        self.assertEqual(positions, sorted(positions))
+
+    def test_base_prompt_unchanged_without_symbol(self):
+        prompt = prompts.get_analysis_prompt(WINDOW_TYPES, "Prior analysis text")
+
+        base_prompt = prompts.BASE_ANALYSIS_PROMPT.format(
+            num_charts=len(WINDOW_TYPES),
+            symbol_text="",
+            chart_context=prompts.get_chart_context(WINDOW_TYPES)
+        )
+        self.assertTrue(prompt.startswith(base_prompt))
+
+    def test_trend_heading_starts_dynamic_part(self):
+        static_prompt, dynamic_prompt = prompts.get_analysis_prompt_parts(WINDOW_TYPES, None, "AAPL")
+
+        self.assertNotIn("**TREND CHANGE EVALUATION**", static_prompt)
+        self.assertTrue(dynamic_prompt.startswith(
+            "These charts are for AAPL.\n\n**TREND CHANGE EVALUATION**"
+        ))
+
+
+if __name__ == "__main__":
+    unittest.main()
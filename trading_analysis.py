@@ -3,17 +3,25 @@ AI Trading Analysis module for screenshot analysis with email alerts
 Supports multiple AI providers through a unified interface
 """
 # Standard library imports
+import atexit
+import json
 import logging
 import os
+import queue
+import re
 import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any, Union
 
 # Local imports
-from utils import encode_image_to_base64, ensure_directory_exists
-from prompts import get_analysis_prompt
+from utils import downscale_image, encode_image_to_base64, ensure_directory_exists, get_shared_client, upload_image
+from prompts import get_analysis_prompt_parts
 
 try:
     from openai import OpenAI
@@ -23,10 +31,73 @@ except ImportError:
     OpenAI = None
     OPENAI_AVAILABLE = False
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging (handlers and level are configured by the application entry point)
 logger = logging.getLogger(__name__)
 
+# Shared decoder for the TREND_EVALUATION JSON block
+_DECODER = json.JSONDecoder()
+
+# ANALYSIS section and TREND_EVALUATION section (up to a repeated marker or the end)
+_SECTION_RE = re.compile(
+    r"=== ANALYSIS ===(.*?)=== TREND_EVALUATION ===(.*?)(?:=== TREND_EVALUATION ===|\Z)",
+    re.DOTALL
+)
+
+# Report separator lines
+_EQ60 = "=" * 60 + "\n"
+_DASH30 = "-" * 30 + "\n"
+_EQ40 = "=" * 40 + "\n"
+
+# Email alert body around the key changes list
+_EMAIL_BODY_HEADER = """
+Stock Analysis Alert{symbol_text}
+Generated: {generated}
+
+ALERT LEVEL: {alert_level}
+
+TREND CHANGE PROBABILITY: {probability}% (Confidence: {confidence})
+
+SUMMARY:
+{summary}
+
+REASONING:
+{reasoning}
+
+KEY CHANGES:
+"""
+_EMAIL_BODY_FOOTER = (
+    "\n" + _EQ60 + "COMPLETE ANALYSIS REPORT\n" + _EQ60 + "\n"
+    "{analysis}\n"
+    "\n---\nThis alert was generated automatically by AI Trading Analysis."
+)
+
+
+@lru_cache(maxsize=32)
+def _read_prior_analysis(report_path: str, mtime_ns: int, size: int) -> Optional[str]:
+    """
+    Read the analysis section of a combined analysis report
+    
+    Memoized on the file's mtime and size so an unchanged report is parsed once.
+    
+    Args:
+        report_path: Path to the combined analysis report
+        mtime_ns: Modification time of the report (cache key)
+        size: Size of the report in bytes (cache key)
+        
+    Returns:
+        The analysis text, or None if the report has no analysis section
+    """
+    with open(report_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # Extract just the analysis part
+    analysis_start = content.find("Combined Analysis Results:")
+    if analysis_start != -1:
+        equals_line = content.find(_EQ40, analysis_start)
+        if equals_line != -1:
+            return content[equals_line + len(_EQ40):].strip() or None
+    return None
+
 
 class PerplexityAnalyzer:
     """Class to handle screenshot analysis using Perplexity API via OpenAI-compatible interface"""
@@ -51,22 +122,49 @@ class PerplexityAnalyzer:
         self.model = os.getenv('PERPLEXITY_MODEL', 'sonar-pro')
         
         # Initialize the OpenAI client with Perplexity's endpoint
-        self.client = OpenAI(
+        self.client = get_shared_client(
+            OpenAI,
             api_key=self.api_key,
             base_url="https://api.perplexity.ai"
         )
+        
+        # Optional image host - when set, screenshots are sent by URL instead of inline base64
+        self.image_upload_url = os.getenv('PERPLEXITY_IMAGE_UPLOAD_URL')
     
-    def encode_image_to_base64(self, image_path: str) -> str:
+    def encode_image_to_base64(self, image_path: Union[str, bytes], stat_result: Optional[os.stat_result] = None) -> str:
         """
         Encode an image file to base64 string (delegates to shared utility)
         
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file, or raw PNG bytes
+            stat_result: Optional os.stat result for image_path
             
         Returns:
             Base64 encoded image as data URI
         """
-        return encode_image_to_base64(image_path)
+        return encode_image_to_base64(image_path, stat_result)
+    
+    def _image_url(self, image_path: str, stat_result: Optional[os.stat_result] = None) -> str:
+        """
+        Get the URL to send for an image: a hosted URL when an upload endpoint
+        is configured, otherwise an inline base64 data URI
+        
+        Args:
+            image_path: Path to the image file
+            stat_result: Optional os.stat result for image_path
+            
+        Returns:
+            Image URL suitable for an image_url content part
+        """
+        downscaled = downscale_image(image_path, stat_result=stat_result)
+        if self.image_upload_url:
+            try:
+                return upload_image(downscaled or image_path, self.image_upload_url)
+            except Exception as e:
+                logger.warning(f"Image upload failed for {image_path}, sending inline instead: {e}")
+        if downscaled:
+            return self.encode_image_to_base64(downscaled)
+        return self.encode_image_to_base64(image_path, stat_result)
     
     def analyze_with_trend_alerts(self, screenshot_data: Dict[str, str], output_dir: str = None, stock_symbol: str = None):
         """
@@ -81,8 +179,17 @@ class PerplexityAnalyzer:
             Tuple of (combined analysis result as string, trend change analysis dict), or (None, None) if analysis failed
         """
         try:
-            # Filter out None/empty paths
-            valid_screenshots = {k: v for k, v in screenshot_data.items() if v and os.path.exists(v)}
+            # Filter out None/empty/missing paths, keeping each stat result for reuse
+            valid_screenshots = {}
+            screenshot_stats = {}
+            for window_type, image_path in screenshot_data.items():
+                if not image_path:
+                    continue
+                try:
+                    screenshot_stats[window_type] = os.stat(image_path)
+                except OSError:
+                    continue
+                valid_screenshots[window_type] = image_path
             
             if not valid_screenshots:
                 logger.warning("No valid screenshots found for analysis")
@@ -96,38 +203,50 @@ class PerplexityAnalyzer:
             else:
                 print(f"   📋 No prior analysis found - this will be the initial analysis")
 
-            # Encode all images
-            image_data_uris = {}
-            for window_type, image_path in valid_screenshots.items():
+            # Encode images concurrently (file reads, downscaling and uploads are
+            # mostly I/O or GIL-releasing work)
+            with ThreadPoolExecutor(max_workers=min(8, len(valid_screenshots))) as executor:
+                futures = {
+                    window_type: executor.submit(self._image_url, image_path, screenshot_stats[window_type])
+                    for window_type, image_path in valid_screenshots.items()
+                }
+            
+            # Collect in window order straight into the request content; the prompt
+            # goes in first once we know which windows were encoded successfully
+            content = [{"type": "text", "text": ""}]
+            window_types = []
+            for window_type, future in futures.items():
                 try:
-                    image_data_uris[window_type] = self.encode_image_to_base64(image_path)
+                    image_uri = future.result()
                 except Exception as e:
-                    logger.error(f"Failed to encode {window_type} image {image_path}: {e}")
+                    logger.error(f"Failed to encode {window_type} image {valid_screenshots[window_type]}: {e}")
                     continue
-            
-            if not image_data_uris:
-                logger.error("Failed to encode any images")
-                return None, None
-            
-            # Create comprehensive prompt
-            prompt = self._create_analysis_prompt(list(image_data_uris.keys()), prior_analysis, stock_symbol)
-            
-            # Build content array with text prompt and all images
-            content = [{"type": "text", "text": prompt}]
-            
-            # Add all images to the content
-            for window_type, image_uri in image_data_uris.items():
                 content.append({
                     "type": "image_url", 
                     "image_url": {"url": image_uri}
                 })
+                window_types.append(window_type)
             
-            print(f"   [AI] Analyzing {len(image_data_uris)} screenshots...")
+            if not window_types:
+                logger.error("Failed to encode any images")
+                return None, None
+            
+            # Static instructions go in a system message so every symbol shares the
+            # same prompt prefix (provider-side prefix caching); the rest is per-symbol
+            system_prompt, content[0]["text"] = self._create_analysis_prompt_parts(
+                window_types, prior_analysis, stock_symbol
+            )
+            
+            print(f"   [AI] Analyzing {len(window_types)} screenshots...")
             
             # Make API request
             completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
+                    {
+                        "role": "system",
+                        "content": system_prompt
+                    },
                     {
                         "role": "user",
                         "content": content
@@ -136,7 +255,7 @@ class PerplexityAnalyzer:
             )
             
             result = completion.choices[0].message.content
-            logger.info(f"Successfully analyzed {len(image_data_uris)} screenshots")
+            logger.debug("Successfully analyzed %d screenshots", len(window_types))
             
             # Parse the response
             analysis_text, change_analysis = self._parse_response(result, prior_analysis)
@@ -162,60 +281,55 @@ class PerplexityAnalyzer:
         """Load the previous analysis report for comparison"""
         try:
             if output_dir is None:
-                for path in valid_screenshots.values():
-                    if path and os.path.exists(path):
-                        output_dir = os.path.dirname(path)
-                        break
-                
-                if output_dir is None:
-                    output_dir = "screenshots"
+                # Callers pass screenshots already filtered on existence
+                output_dir = os.path.dirname(next(iter(valid_screenshots.values()), '')) or "screenshots"
             
             prior_report_path = os.path.join(output_dir, "combined_analysis_latest.txt")
             
-            if os.path.exists(prior_report_path):
-                with open(prior_report_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Extract just the analysis part
-                analysis_start = content.find("Combined Analysis Results:")
-                if analysis_start != -1:
-                    equals_line = content.find("=" * 40, analysis_start)
-                    if equals_line != -1:
-                        analysis_content = content[equals_line + 40:].strip()
-                        if analysis_content:
-                            logger.info("Loaded prior analysis for comparison")
-                            return analysis_content
-                
-                logger.info("Prior analysis file found but could not extract content")
-                return None
-            else:
-                logger.info("No prior analysis file found")
+            try:
+                stat_result = os.stat(prior_report_path)
+            except FileNotFoundError:
+                logger.debug("No prior analysis file found")
                 return None
+            
+            # Re-read only when the report has been rewritten
+            analysis_content = _read_prior_analysis(prior_report_path, stat_result.st_mtime_ns, stat_result.st_size)
+            if analysis_content:
+                logger.debug("Loaded prior analysis for comparison")
+                return analysis_content
+            
+            logger.debug("Prior analysis file found but could not extract content")
+            return None
                 
         except Exception as e:
             logger.warning(f"Error loading prior analysis: {e}")
             return None
     
-    def _create_analysis_prompt(self, window_types: list, prior_analysis: str = None, stock_symbol: str = None) -> str:
-        """Create analysis prompt using centralized configurable prompts"""
-        return get_analysis_prompt(window_types, prior_analysis, stock_symbol)
+    def _create_analysis_prompt_parts(self, window_types: list, prior_analysis: str = None, stock_symbol: str = None) -> tuple:
+        """Create the (system, user) analysis prompt using centralized configurable prompts"""
+        return get_analysis_prompt_parts(window_types, prior_analysis, stock_symbol)
     
     def _parse_response(self, response: str, prior_analysis: str = None) -> tuple:
         """Parse the response to extract analysis and trend evaluation"""
         try:
-            import json
-            
-            if "=== ANALYSIS ===" in response and "=== TREND_EVALUATION ===" in response:
-                analysis_section = response.split("=== ANALYSIS ===")[1].split("=== TREND_EVALUATION ===")[0].strip()
-                trend_section = response.split("=== TREND_EVALUATION ===")[1].strip()
+            sections = _SECTION_RE.search(response)
+            if sections:
+                analysis_section = sections.group(1).strip()
+                trend_section = sections.group(2).strip()
                 
                 json_start = trend_section.find('{')
-                json_end = trend_section.rfind('}') + 1
+                trend_data = None
                 
-                if json_start != -1 and json_end > json_start:
-                    json_str = trend_section[json_start:json_end]
-                    trend_data = json.loads(json_str)
-                    
+                if json_start != -1:
+                    # raw_decode stops at the end of the object, so trailing prose is ignored
+                    try:
+                        trend_data, _ = _DECODER.raw_decode(trend_section, json_start)
+                    except json.JSONDecodeError:
+                        # An unterminated object is an unstructured reply, not a parse error
+                        if trend_section.rfind('}') > json_start:
+                            raise
+                
+                if trend_data is not None:
                     change_analysis = {
                         # 'has_changes' is only relevant for consensus/Google AI, not Perplexity/Claude
                         'change_type': 'consolidated_evaluation',
@@ -261,52 +375,53 @@ class PerplexityAnalyzer:
         """Save the combined analysis report"""
         try:
             if output_dir is None:
-                for path in screenshot_data.values():
-                    if path and os.path.exists(path):
-                        output_dir = os.path.dirname(path)
-                        break
-                
-                if output_dir is None:
-                    output_dir = "screenshots"
+                first_path = next((path for path in screenshot_data.values() if path), '')
+                output_dir = os.path.dirname(first_path) or "screenshots"
             
             ensure_directory_exists(output_dir)
             
             report_filename = "combined_analysis_latest.txt"
             report_path = os.path.join(output_dir, report_filename)
             
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write(f"Combined Screenshot Analysis Report\n")
-                f.write(f"=" * 60 + "\n")
-                f.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Screenshots Analyzed: {len([v for v in screenshot_data.values() if v])}\n\n")
+            # Build the whole report in memory and write it in one call
+            screenshot_sources = "".join(
+                f"- {window_type.replace('_', ' ').title()}: {os.path.basename(image_path)}\n"
+                for window_type, image_path in screenshot_data.items() if image_path
+            )
+            parts = [
+                "Combined Screenshot Analysis Report\n",
+                _EQ60,
+                f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+                f"Screenshots Analyzed: {len([v for v in screenshot_data.values() if v])}\n\n",
+                "Screenshot Sources:\n",
+                _DASH30,
+                screenshot_sources,
+            ]
+            
+            if change_analysis:
+                probability = change_analysis.get('trend_change_probability', 0)
+                confidence = change_analysis.get('confidence_level', 'unknown')
+                has_changes = change_analysis.get('has_changes', False)
+                alert_level = change_analysis.get('alert_level', 'info')
                 
-                f.write("Screenshot Sources:\n")
-                f.write("-" * 30 + "\n")
-                for window_type, image_path in screenshot_data.items():
-                    if image_path:
-                        f.write(f"- {window_type.replace('_', ' ').title()}: {os.path.basename(image_path)}\n")
+                parts.append("\nTrend Change Analysis:\n")
+                parts.append(_DASH30)
+                parts.append(f"[DATA] Trend Change Probability: {probability}%\n")
+                parts.append(f"[>>] Confidence Level: {confidence.upper()}\n")
+                parts.append(f"[ALERT] Status: {'ALERT' if has_changes else 'NO ALERT'} ({alert_level.upper()})\n")
                 
-                if change_analysis:
-                    f.write(f"\nTrend Change Analysis:\n")
-                    f.write(f"-" * 30 + "\n")
-                    probability = change_analysis.get('trend_change_probability', 0)
-                    confidence = change_analysis.get('confidence_level', 'unknown')
-                    has_changes = change_analysis.get('has_changes', False)
-                    alert_level = change_analysis.get('alert_level', 'info')
-                    
-                    f.write(f"[DATA] Trend Change Probability: {probability}%\n")
-                    f.write(f"[>>] Confidence Level: {confidence.upper()}\n")
-                    f.write(f"[ALERT] Status: {'ALERT' if has_changes else 'NO ALERT'} ({alert_level.upper()})\n")
-                    
-                    if 'summary' in change_analysis:
-                        f.write(f"[SUMMARY] {change_analysis['summary']}\n")
-                    
-                    f.write(f"\n")
+                if 'summary' in change_analysis:
+                    parts.append(f"[SUMMARY] {change_analysis['summary']}\n")
                 
-                f.write(f"Combined Analysis Results:\n")
-                f.write(f"=" * 40 + "\n")
-                f.write(analysis)
-                f.write(f"\n\n")
+                parts.append("\n")
+            
+            parts.append("Combined Analysis Results:\n")
+            parts.append(_EQ40)
+            parts.append(analysis)
+            parts.append("\n\n")
+            
+            with open(report_path, 'w', encoding='utf-8', buffering=65536) as f:
+                f.write("".join(parts))
             
             logger.info(f"Combined analysis report saved: {report_path}")
             print(f"   [REPORT] Saved to: {os.path.basename(report_path)}")
@@ -317,11 +432,123 @@ class PerplexityAnalyzer:
             raise
 
 
+# Background email delivery: (EmailAlertManager, message) items sent in order,
+# with None telling the sender thread to stop
+_email_queue: Optional["queue.Queue"] = None
+_email_worker: Optional[threading.Thread] = None
+_email_worker_lock = threading.Lock()
+
+
+class _SMTPSession:
+    """Authenticated SMTP connection owned by the background email worker"""
+    
+    def __init__(self):
+        self._server = None
+        self._settings = None
+    
+    def sendmail(self, manager: "EmailAlertManager", message: str):
+        """Send a message, reusing the open connection when the settings match"""
+        settings = (manager.smtp_server, manager.smtp_port, manager.email_user, manager.email_password)
+        if self._server is not None and settings == self._settings:
+            try:
+                self._server.sendmail(manager.email_user, manager.email_to, message)
+                return
+            except smtplib.SMTPServerDisconnected:
+                logger.warning("SMTP session was closed by the server, reconnecting for this alert")
+        
+        self.close()
+        self._server = manager._connect()
+        self._settings = settings
+        self._server.sendmail(manager.email_user, manager.email_to, message)
+    
+    def close(self):
+        """Log out and drop the connection, if one is open"""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+        self._settings = None
+
+
+def _email_worker_loop(alerts: "queue.Queue"):
+    """Send queued email alerts one at a time until told to stop"""
+    # Alerts queued together (e.g. several symbols in one cycle) share one
+    # connection instead of connecting, starting TLS and logging in for each;
+    # only this thread ever touches the session
+    session = _SMTPSession()
+    while True:
+        item = alerts.get()
+        if item is None:
+            session.close()
+            return
+        manager, message = item
+        try:
+            if not manager._send_message(message, session):
+                session.close()
+        except Exception as e:
+            logger.error(f"Background email delivery failed: {e}")
+            session.close()
+        finally:
+            if alerts.empty():
+                session.close()
+
+
+def _queue_email_alert(manager: "EmailAlertManager", message: str):
+    """Queue a message for the background sender, starting it on first use"""
+    global _email_queue, _email_worker
+    with _email_worker_lock:
+        if _email_worker is None:
+            _email_queue = queue.Queue()
+            _email_worker = threading.Thread(
+                target=_email_worker_loop, args=(_email_queue,), name="email-alerts", daemon=True
+            )
+            _email_worker.start()
+        _email_queue.put((manager, message))
+
+
+def flush_email_alerts(timeout: Optional[float] = None) -> bool:
+    """
+    Send all queued email alerts and stop the background sender thread
+    
+    Alerts queued afterwards start a new sender thread.
+    
+    Args:
+        timeout: Maximum seconds to wait (None waits indefinitely)
+        
+    Returns:
+        True if every queued alert was handled, False if the timeout expired first
+    """
+    global _email_queue, _email_worker
+    with _email_worker_lock:
+        worker, alerts = _email_worker, _email_queue
+        _email_worker = _email_queue = None
+    if worker is None:
+        return True
+    
+    alerts.put(None)
+    worker.join(timeout)
+    return not worker.is_alive()
+
+
+# Don't lose queued alerts when the process exits
+atexit.register(flush_email_alerts, 60.0)
+
+
 class EmailAlertManager:
     """Class to handle email alerts for trend changes"""
     
-    def __init__(self):
-        """Initialize email settings from environment variables"""
+    def __init__(self, background: bool = False):
+        """
+        Initialize email settings from environment variables
+        
+        Args:
+            background: Queue alerts for a background sender thread instead of
+                sending them before send_trend_alert returns
+        """
+        self.background = background
         self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
         self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
         self.email_user = os.getenv('EMAIL_USER')
@@ -338,7 +565,13 @@ class EmailAlertManager:
             logger.warning("Email alerts not configured. Set EMAIL_USER, EMAIL_PASSWORD, and EMAIL_TO in .env file")
     
     def send_trend_alert(self, change_analysis: Dict[str, Any], current_analysis: str, stock_symbol: str = None, output_dir: str = None) -> bool:
-        """Send email alert for detected trend changes"""
+        """
+        Send email alert for detected trend changes
+        
+        Returns:
+            True if the alert was sent (or, for a background manager, queued) or
+            none was needed; background delivery failures are only logged
+        """
         if not self.is_configured:
             logger.warning("Email not configured - skipping alert")
             return False
@@ -357,12 +590,27 @@ class EmailAlertManager:
             msg['Subject'] = subject
             
             msg.attach(MIMEText(body, 'plain'))
-            
-            # Use context manager to ensure connection is properly closed
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email_user, self.email_password)
-                server.sendmail(self.email_user, self.email_to, msg.as_string())
+            message = msg.as_string()
+        except Exception as e:
+            logger.error(f"Unexpected error building email: {e}")
+            print(f"   [ERROR] Failed to send email: {e}")
+            return False
+        
+        if self.background:
+            # Hand off to the sender thread; delivery errors are logged there
+            _queue_email_alert(self, message)
+            logger.info(f"Email alert queued for {self.email_to}")
+            return True
+        
+        return self._send_message(message)
+    
+    def _send_message(self, message: str, session: Optional[_SMTPSession] = None) -> bool:
+        """Deliver a composed message, reporting the outcome"""
+        try:
+            if session is not None:
+                session.sendmail(self, message)
+            else:
+                self._deliver(message)
             
             logger.info(f"Email sent successfully to {self.email_to}")
             print(f"   [EMAIL] Alert sent to {self.email_to}")
@@ -381,6 +629,23 @@ class EmailAlertManager:
             print(f"   [ERROR] Failed to send email: {e}")
             return False
     
+    def _connect(self) -> smtplib.SMTP:
+        """Open an authenticated SMTP connection"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.email_user, self.email_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _deliver(self, message: str):
+        """Send a message over a one-off connection"""
+        # Use context manager to ensure connection is properly closed
+        with self._connect() as server:
+            server.sendmail(self.email_user, self.email_to, message)
+    
     def _create_email_subject(self, change_analysis: Dict[str, Any], stock_symbol: str) -> str:
         """Create email subject line"""
         alert_level = change_analysis.get('alert_level', 'low').upper()
@@ -401,34 +666,21 @@ class EmailAlertManager:
         probability = change_analysis.get('trend_change_probability', 0)
         confidence = change_analysis.get('confidence_level', 'unknown')
         
-        body = f"""
-Stock Analysis Alert{symbol_text}
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-ALERT LEVEL: {change_analysis.get('alert_level', 'unknown').upper()}
-
-TREND CHANGE PROBABILITY: {probability}% (Confidence: {confidence.upper()})
-
-SUMMARY:
-{change_analysis.get('summary', 'No summary available')}
-
-REASONING:
-{change_analysis.get('probability_reasoning', 'No reasoning provided')}
-
-KEY CHANGES:
-"""
-        
         key_changes = change_analysis.get('key_changes', [])
+        
+        parts = [_EMAIL_BODY_HEADER.format(
+            symbol_text=symbol_text,
+            generated=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            alert_level=change_analysis.get('alert_level', 'unknown').upper(),
+            probability=probability,
+            confidence=confidence.upper(),
+            summary=change_analysis.get('summary', 'No summary available'),
+            reasoning=change_analysis.get('probability_reasoning', 'No reasoning provided')
+        )]
         if key_changes:
-            for change in key_changes:
-                body += f"- {change}\n"
+            parts.extend(f"- {change}\n" for change in key_changes)
         else:
-            body += "- No specific changes identified\n"
-        
-        body += f"\n{'='*60}\n"
-        body += f"COMPLETE ANALYSIS REPORT\n"
-        body += f"{'='*60}\n\n"
-        body += f"{current_analysis}\n"
-        body += f"\n---\nThis alert was generated automatically by AI Trading Analysis."
+            parts.append("- No specific changes identified\n")
+        parts.append(_EMAIL_BODY_FOOTER.format(analysis=current_analysis))
         
-        return body
\ No newline at end of file
+        return "".join(parts)
\ No newline at end of file
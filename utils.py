@@ -1,10 +1,41 @@
 """
 Shared utility functions for the desktop_auto project
 """
-import base64
+import binascii
+import hashlib
+import io
+import json
 import os
 import logging
-from typing import Optional
+import re
+import threading
+import urllib.request
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Optional, Set, Union
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+# SIMD base64 encoder when installed (same output as the stdlib encoder)
+try:
+    from pybase64 import b64encode
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    # Same as base64.b64encode without its Python-level wrapper
+    b64encode = partial(binascii.b2a_base64, newline=False)
+    PYBASE64_AVAILABLE = False
+
+# Linear-time regex engine for log redaction when installed
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    re2 = None
+    RE2_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
@@ -20,13 +51,226 @@ WINDOW_VOLUME_LAYOUT = "volume layout"
 WINDOW_UTBOT = "UT Bot -Lorentzian"
 WINDOW_SYMBOLIK = "workspace"
 
+# Longest edge (in pixels) screenshots are scaled down to before upload; 0 disables.
+# Vision models downsample larger images anyway; 1568 is Claude's native limit
+# and keeps price labels and indicator counts legible for every provider
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '1568'))
+
+# Number of encoded images kept in memory; a capture cycle produces at most 5
+# screenshots, so this covers every provider re-encoding the same files
+_URI_CACHE_SIZE = 8
+_uri_by_digest: Dict[bytes, str] = {}
+_uri_cache_lock = threading.Lock()
+
+# API clients shared by every analyzer instance, keyed by factory and arguments
+_shared_clients: Dict[tuple, Any] = {}
+_shared_clients_lock = threading.Lock()
+
+# Directories already created by ensure_directory_exists in this process
+_ensured_directories: Set[str] = set()
+
+# Read size for streamed base64 encoding; a multiple of 3 so that chunks
+# encode independently without padding
+_B64_CHUNK_SIZE = 57 * 1024
+
+# Patterns redacted by sanitize_for_logging by default
+_DEFAULT_SENSITIVE_PATTERNS = (
+    r'pplx-[a-zA-Z0-9]+',  # Perplexity API key
+    r'sk-ant-[a-zA-Z0-9\-]+',  # Anthropic API key
+    r'AIza[a-zA-Z0-9\-_]+',  # Google API key
+    r'password["\']?\s*[:=]\s*["\']?[^"\'\s]+',  # Passwords
+    r'api[_-]?key["\']?\s*[:=]\s*["\']?[^"\'\s]+',  # Generic API keys
+)
+
+# Default patterns joined into one case-insensitive alternation so redaction is
+# a single scan; compiled with RE2 when available so matching stays linear-time
+# on untrusted model output (the patterns use no backreferences or lookaround)
+_SENSITIVE_PATTERN = "(?i)" + "|".join(f"(?:{pattern})" for pattern in _DEFAULT_SENSITIVE_PATTERNS)
+
+# Literal prefix of each default pattern, searched before the full regex with
+# the same engine and case folding so it never skips text the regex would match
+_SENSITIVE_PREFIX_PATTERN = "(?i)pplx-|sk-ant-|aiza|password|api"
+
+_SENSITIVE_RE = None
+if RE2_AVAILABLE:
+    try:
+        _SENSITIVE_RE = re2.compile(_SENSITIVE_PATTERN)
+        _SENSITIVE_PREFIX_RE = re2.compile(_SENSITIVE_PREFIX_PATTERN)
+    except Exception as e:
+        _SENSITIVE_RE = None
+        logger.debug("RE2 rejected redaction patterns, using re: %s", e)
+if _SENSITIVE_RE is None:
+    _SENSITIVE_RE = re.compile(_SENSITIVE_PATTERN)
+    _SENSITIVE_PREFIX_RE = re.compile(_SENSITIVE_PREFIX_PATTERN)
+
+# Image MIME types by leading file signature (WebP is matched separately since
+# its RIFF header has a size field before the format tag)
+_MIME_BY_SIGNATURE = (
+    (b'\x89PNG', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+)
+
+# Image MIME types by lowercase file extension
+_MIME_BY_EXT = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+# Data URI header for each supported MIME type
+_URI_HEADERS = {
+    mime_type: f"data:{mime_type};base64,".encode('ascii')
+    for mime_type in _MIME_BY_EXT.values()
+}
+
+
+@lru_cache(maxsize=32)
+def _downscale_cached(image_path: str, mtime_ns: int, max_dim: int) -> Optional[bytes]:
+    """Downscale an image file to PNG bytes (cached per file modification time)"""
+    with Image.open(image_path) as img:
+        if max(img.size) <= max_dim:
+            return None
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
 
-def encode_image_to_base64(image_path: str) -> str:
+
+def downscale_image(image_path: str, max_dim: int = IMAGE_MAX_DIMENSION,
+                    stat_result: Optional[os.stat_result] = None) -> Optional[bytes]:
     """
-    Encode an image file to base64 string with data URI
+    Downscale a screenshot so its longest edge is at most max_dim pixels
     
     Args:
         image_path: Path to the image file
+        max_dim: Maximum width/height in pixels (0 disables resizing)
+        stat_result: Optional os.stat result for image_path, saves a stat call
+        
+    Returns:
+        PNG bytes of the resized image, or None if the image is already small
+        enough, resizing is disabled, Pillow is unavailable or the file cannot be read
+    """
+    if not PIL_AVAILABLE or max_dim <= 0:
+        return None
+    
+    try:
+        if stat_result is None:
+            stat_result = os.stat(image_path)
+        return _downscale_cached(image_path, stat_result.st_mtime_ns, max_dim)
+    except OSError as e:
+        logger.warning("Could not downscale image %s: %s", image_path, e)
+        return None
+
+
+def _sniff_mime_type(header: bytes) -> Optional[str]:
+    """Identify an image MIME type from the first 12 bytes of the file, if known"""
+    for signature, mime_type in _MIME_BY_SIGNATURE:
+        if header.startswith(signature):
+            return mime_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def _remember_uri(key: bytes, image_data_uri: str) -> None:
+    """Store an encoded data URI by content key, evicting the oldest entry when full"""
+    with _uri_cache_lock:
+        if len(_uri_by_digest) >= _URI_CACHE_SIZE:
+            del _uri_by_digest[next(iter(_uri_by_digest))]
+        _uri_by_digest[key] = image_data_uri
+
+
+def _encode_bytes(data: bytes, mime_type: str) -> str:
+    """Encode image bytes as a data URI, reusing the result for identical content"""
+    key = hashlib.blake2b(data, digest_size=16).digest() + mime_type.encode()
+    image_data_uri = _uri_by_digest.get(key)
+    if image_data_uri is None:
+        image_data_uri = (_URI_HEADERS[mime_type] + b64encode(data)).decode('ascii')
+        _remember_uri(key, image_data_uri)
+    return image_data_uri
+
+
+def _read_chunk(image_file, chunk_view: memoryview) -> int:
+    """
+    Fill chunk_view from an unbuffered file, stopping early only at end of file
+    
+    Raw reads may return fewer bytes than requested before EOF; a short chunk
+    that is not a multiple of 3 would put padding in the middle of the base64.
+    
+    Returns:
+        Number of bytes read into the start of chunk_view
+    """
+    filled = 0
+    while filled < len(chunk_view):
+        n = image_file.readinto(chunk_view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+@lru_cache(maxsize=_URI_CACHE_SIZE)
+def _encode_file_cached(image_path: str, mtime_ns: int, size: int) -> str:
+    """
+    Encode an image file as a data URI (cached per path, modification time and size)
+    
+    The file is read chunk by chunk into one reused buffer and encoded into a
+    buffer preallocated for the final length, so the raw image is never held
+    in memory as a whole and no per-chunk bytes objects are allocated.
+    """
+    chunk_buffer = bytearray(_B64_CHUNK_SIZE)
+    chunk_view = memoryview(chunk_buffer)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(image_path, "rb", buffering=0) as image_file:
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(image_file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass  # Only a read-ahead hint
+        n = _read_chunk(image_file, chunk_view)
+        
+        # Determine the MIME type from the file signature, falling back to the
+        # file extension (default to PNG)
+        mime_type = _sniff_mime_type(chunk_buffer[:min(n, 12)])
+        if mime_type is None:
+            file_ext = image_path.rpartition('.')[2].lower()
+            mime_type = _MIME_BY_EXT.get(file_ext, 'image/png')
+        
+        prefix = _URI_HEADERS[mime_type]
+        encoded = bytearray(len(prefix) + 4 * ((size + 2) // 3))
+        encoded[:len(prefix)] = prefix
+        pos = len(prefix)
+        
+        while n:
+            chunk = chunk_view[:n]
+            digest.update(chunk)
+            piece = b64encode(chunk)
+            # Grows the buffer if the file changed size since it was stat'ed
+            encoded[pos:pos + len(piece)] = piece
+            pos += len(piece)
+            n = _read_chunk(image_file, chunk_view)
+    del encoded[pos:]
+    
+    # Identical content under another path/mtime shares one string
+    key = digest.digest() + mime_type.encode()
+    image_data_uri = _uri_by_digest.get(key)
+    if image_data_uri is None:
+        image_data_uri = encoded.decode('ascii')
+        _remember_uri(key, image_data_uri)
+    return image_data_uri
+
+
+def encode_image_to_base64(image_path: Union[str, bytes],
+                           stat_result: Optional[os.stat_result] = None) -> str:
+    """
+    Encode an image file to base64 string with data URI
+    
+    Args:
+        image_path: Path to the image file, or raw PNG bytes (e.g. from downscale_image)
+        stat_result: Optional os.stat result for image_path, saves a stat call
         
     Returns:
         Base64 encoded image as data URI
@@ -35,35 +279,115 @@ def encode_image_to_base64(image_path: str) -> str:
         FileNotFoundError: If image file doesn't exist
         IOError: If image cannot be read
     """
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image file not found: {image_path}")
+    if isinstance(image_path, bytes):
+        return _encode_bytes(image_path, _sniff_mime_type(image_path[:12]) or 'image/png')
     
     try:
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+        if stat_result is None:
+            stat_result = os.stat(image_path)
+        return _encode_file_cached(image_path, stat_result.st_mtime_ns, stat_result.st_size)
         
-        # Determine the MIME type based on file extension
-        file_ext = os.path.splitext(image_path)[1].lower()
-        if file_ext == '.png':
-            mime_type = 'image/png'
-        elif file_ext in ['.jpg', '.jpeg']:
-            mime_type = 'image/jpeg'
-        elif file_ext == '.gif':
-            mime_type = 'image/gif'
-        elif file_ext == '.webp':
-            mime_type = 'image/webp'
-        else:
-            mime_type = 'image/png'  # Default to PNG
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image file not found: {image_path}") from None
+    except OSError as e:
+        logger.error("Error reading image %s: %s", image_path, e)
+        raise
+
+
+def upload_image(image_path: Union[str, bytes], upload_url: str, timeout: float = 30.0) -> str:
+    """
+    Upload raw image bytes to an image host and return the hosted URL
+    
+    The endpoint receives the file as the POST body and must answer with
+    either a JSON object containing a "url" field or the bare URL as text.
+    
+    Args:
+        image_path: Path to the image file, or already-loaded image bytes
+        upload_url: Endpoint that accepts the raw image bytes
+        timeout: Request timeout in seconds
         
-        image_data_uri = f"data:{mime_type};base64,{base64_image}"
-        return image_data_uri
+    Returns:
+        Publicly reachable URL of the uploaded image
         
-    except IOError as e:
-        logger.error(f"Error reading image {image_path}: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Error encoding image {image_path}: {e}")
-        raise
+    Raises:
+        OSError: If the image cannot be read or the upload fails
+        ValueError: If the endpoint response does not contain a URL
+    """
+    if isinstance(image_path, bytes):
+        data = image_path
+        image_path = "image bytes"
+    else:
+        with open(image_path, "rb") as image_file:
+            data = image_file.read()
+    
+    request = urllib.request.Request(
+        upload_url,
+        data=data,
+        method="POST",
+        headers={"Content-Type": "application/octet-stream"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        body = response.read().decode("utf-8").strip()
+    
+    if body.startswith("{"):
+        body = json.loads(body).get("url", "")
+    if not body.startswith(("http://", "https://")):
+        raise ValueError(f"Upload endpoint did not return an image URL for {image_path}")
+    return body
+
+
+def get_shared_client(factory: Callable[..., Any], **kwargs) -> Any:
+    """
+    Get a process-wide API client, creating it on first use
+    
+    Analyzers are rebuilt for every symbol; sharing the SDK client keeps its
+    HTTP connection pool alive so later requests skip the TCP/TLS handshake.
+    
+    Args:
+        factory: Client class or constructor (e.g. OpenAI, anthropic.Anthropic)
+        **kwargs: Constructor arguments (must be hashable)
+        
+    Returns:
+        Shared client instance
+    """
+    key = (factory, tuple(sorted(kwargs.items())))
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = _shared_clients[key] = factory(**kwargs)
+    return client
+
+
+def filter_existing_files(paths: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """
+    Keep the entries whose path points to an existing file
+    
+    Each containing directory is listed once with os.scandir instead of
+    stat'ing every path separately.
+    
+    Args:
+        paths: Dict of {key: file path}; empty/None paths are dropped
+        
+    Returns:
+        Dict of {key: file path} for the files that exist, in the original order
+    """
+    listings: Dict[str, set] = {}
+    existing = {}
+    for key, path in paths.items():
+        if not path:
+            continue
+        directory, name = os.path.split(path)
+        names = listings.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory or '.') as entries:
+                    names = {os.path.normcase(entry.name) for entry in entries if entry.is_file()}
+            except OSError:
+                names = set()
+            listings[directory] = names
+        if os.path.normcase(name) in names:
+            existing[key] = path
+    return existing
 
 
 def sanitize_for_logging(text: str, sensitive_patterns: Optional[list] = None) -> str:
@@ -72,7 +396,8 @@ def sanitize_for_logging(text: str, sensitive_patterns: Optional[list] = None) -
     
     Args:
         text: Text to sanitize
-        sensitive_patterns: List of patterns to redact (default: API keys, passwords)
+        sensitive_patterns: List of patterns to redact (default: API keys, passwords).
+            Custom patterns are always compiled with the stdlib re module.
         
     Returns:
         Sanitized text with sensitive info redacted
@@ -80,24 +405,28 @@ def sanitize_for_logging(text: str, sensitive_patterns: Optional[list] = None) -
     if not text:
         return text
     
-    import re
-    
     if sensitive_patterns is None:
-        sensitive_patterns = [
-            r'pplx-[a-zA-Z0-9]+',  # Perplexity API key
-            r'sk-ant-[a-zA-Z0-9\-]+',  # Anthropic API key
-            r'AIza[a-zA-Z0-9\-_]+',  # Google API key
-            r'password["\']?\s*[:=]\s*["\']?[^"\'\s]+',  # Passwords
-            r'api[_-]?key["\']?\s*[:=]\s*["\']?[^"\'\s]+',  # Generic API keys
-        ]
+        # Clean text (the common case) contains none of the literal prefixes
+        if not _SENSITIVE_PREFIX_RE.search(text):
+            return text
+        return _SENSITIVE_RE.sub('[REDACTED]', text)
     
+    # Applied one at a time, in order, so each pattern sees the previous
+    # redactions and may carry its own inline flags
     sanitized = text
     for pattern in sensitive_patterns:
-        sanitized = re.sub(pattern, '[REDACTED]', sanitized, flags=re.IGNORECASE)
+        sanitized = _compile_sensitive_pattern(pattern).sub('[REDACTED]', sanitized)
     
     return sanitized
 
 
+@lru_cache(maxsize=32)
+def _compile_sensitive_pattern(pattern: str) -> "re.Pattern":
+    """Compile a single case-insensitive redaction pattern, cached across calls"""
+    return re.compile(pattern, re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
 def get_base_dir() -> str:
     """
     Get the base directory for the application
@@ -126,8 +455,14 @@ def ensure_directory_exists(directory: str) -> None:
     Raises:
         OSError: If directory cannot be created
     """
+    normalized = os.path.abspath(directory)
+    # Re-check cached entries: the folder may have been deleted since
+    if normalized in _ensured_directories and os.path.isdir(normalized):
+        return
+    
     try:
-        os.makedirs(directory, exist_ok=True)
+        os.makedirs(normalized, exist_ok=True)
     except OSError as e:
-        logger.error(f"Failed to create directory {directory}: {e}")
+        logger.error("Failed to create directory %s: %s", directory, e)
         raise
+    _ensured_directories.add(normalized)